@@ -1,12 +1,33 @@
 import os
+import re
+import time
+import asyncio
 import json
-from datetime import datetime, timedelta
+import bisect
+import sqlite3
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta, time as dtime
+from itertools import islice
+from typing import Optional
 from zoneinfo import ZoneInfo
 
 import discord
 from discord.ext import commands, tasks
-from difflib import get_close_matches
 from dotenv import load_dotenv
+from rapidfuzz import fuzz, process
+
+# Optional C JSON codec; falls back to stdlib json.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional C ISO-8601 parser; stdlib fromisoformat handles everything we store.
+try:
+    from ciso8601 import parse_datetime as parse_iso
+except ImportError:
+    parse_iso = datetime.fromisoformat
 
 # ------------------------------------------------------------
 # Configuration & Setup
@@ -18,10 +39,41 @@ TOKEN = os.getenv("DISCORD_TOKEN")
 # EQ2 canonical time zone (DST-aware)
 TIMEZONE = ZoneInfo("America/New_York")
 
-INTENTS = discord.Intents.all()
+# Only what prefix commands in guild channels need; no presence/member streams
+INTENTS = discord.Intents(guilds=True, guild_messages=True, message_content=True)
 bot = commands.Bot(command_prefix="!", intents=INTENTS)
 
+# In-memory copy of the database; the source of truth while the bot runs.
+# flush_data writes back only the guilds listed in dirty_guilds.
+bot.data_cache = None
+bot.dirty_guilds = set()
+bot.db = None
+# Serializes writes: a cancelled flush's worker thread may still be writing
+# when flush_data_on_stop runs on the event loop thread.
+bot.db_lock = threading.Lock()
+
+# Guilds with a status channel; the only ones the status loop visits
+bot.status_guilds = set()
+
+# Per-guild locks and in-flight command-triggered board refreshes
+bot.status_locks = {}
+bot.status_tasks = set()
+
+# guild id -> (last status board content, its (Partial)Message)
+bot.status_cache = {}
+
+# SQLite store, one row per guild. DATA_FILE is the old JSON store; it is
+# imported into DB_FILE once, then renamed to DATA_FILE + ".imported".
+# DB_FILE defaults to DATA_FILE's directory so it lands on the same volume.
 DATA_FILE = os.getenv("DATA_FILE", "mobs_data.json")
+DB_FILE = os.getenv("DB_FILE", os.path.join(os.path.dirname(DATA_FILE), "mobs.db"))
+
+# Number of TODs kept per mob for window learning (7 intervals; the
+# outlier trim keeps the middle 5)
+TOD_HISTORY_MAX = 8
+
+# Pretty-print stored JSON when DEBUG is set; compact otherwise
+DEBUG = bool(os.getenv("DEBUG"))
 
 # ------------------------------------------------------------
 # Core Helpers (Time & Data)
@@ -31,27 +83,104 @@ def now_local() -> datetime:
     """Return current aware datetime in Eastern time."""
     return datetime.now(TIMEZONE)
 
-def load_data():
-    """Load entire mobs_data.json into a Python dict."""
+def dumps_data(data) -> bytes:
+    """Serialize a guild block for storage (indented only when DEBUG is set)."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if DEBUG else 0)
+    if DEBUG:
+        return json.dumps(data, indent=2).encode("utf-8")
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+def loads_data(raw: bytes):
+    """Parse a stored guild block (or the legacy JSON file)."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def get_db():
+    """Open DB_FILE on first use (WAL mode) and make sure the schema exists."""
+    if bot.db is None:
+        dirpath = os.path.dirname(DB_FILE)
+        if dirpath and not os.path.exists(dirpath):
+            os.makedirs(dirpath, exist_ok=True)
+
+        # Flushes run in a worker thread (see flush_data)
+        conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS guilds ("
+            " guild_id TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL)"
+        )
+        conn.commit()
+        bot.db = conn
+    return bot.db
+
+def read_legacy_json():
+    """Read the old mobs_data.json, if present, for a one-time import."""
     if not os.path.exists(DATA_FILE):
         return {}
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(DATA_FILE, "rb") as f:
+            return loads_data(f.read())
     except Exception:
         return {}
 
-def save_data(data):
-    """Persist full mob data to JSON storage."""
-    dirpath = os.path.dirname(DATA_FILE)
-    if dirpath and not os.path.exists(dirpath):
-        os.makedirs(dirpath, exist_ok=True)
+def read_database():
+    """Load every guild block, importing DATA_FILE if the database is empty."""
+    rows = get_db().execute("SELECT guild_id, data FROM guilds").fetchall()
+    if rows:
+        return {gid: loads_data(raw) for gid, raw in rows}
 
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    data = read_legacy_json()
+    if data:
+        write_guild_rows(encode_guilds(data, data.keys()))
+        # Move the JSON aside so a missing/empty database never reloads it
+        try:
+            os.replace(DATA_FILE, DATA_FILE + ".imported")
+        except OSError as e:
+            print(f"[ERROR] could not rename imported {DATA_FILE}: {e}")
+    return data
+
+def encode_guilds(data, guild_ids) -> list:
+    """(guild_id, blob) rows for the given guilds, ready for write_guild_rows."""
+    return [
+        (gid, dumps_data(persistable_guild(data[gid])))
+        for gid in guild_ids if gid in data
+    ]
+
+def write_guild_rows(rows):
+    """Upsert encoded guild rows in a single transaction (thread-safe)."""
+    conn = get_db()
+    with bot.db_lock, conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO guilds (guild_id, data) VALUES (?, ?)", rows
+        )
+
+def persistable_guild(gdata):
+    """Copy of a guild block without in-memory-only ("_"-prefixed) fields."""
+    block = {k: v for k, v in gdata.items() if not k.startswith("_")}
+    block["mobs"] = {
+        key: {
+            k: list(v) if isinstance(v, deque) else v
+            for k, v in mob.items() if not k.startswith("_")
+        }
+        for key, mob in gdata.get("mobs", {}).items()
+    }
+    return block
+
+def load_data():
+    """Return the in-memory data dict, reading the database on first use."""
+    if bot.data_cache is None:
+        bot.data_cache = read_database()
+    return bot.data_cache
 
 def get_guild_data(guild_id):
-    """Return or create guild-level block."""
+    """
+    Return or create guild-level block. Read-only: defaults are filled in
+    memory and persisted by the next update_guild_data for this guild.
+    """
     data = load_data()
     gid = str(guild_id)
 
@@ -61,77 +190,90 @@ def get_guild_data(guild_id):
             "status_message_id": None,
             "mobs": {}
         }
-        save_data(data)
         return data[gid]
 
     # Guarantee keys
-    if "status_channel_id" not in data[gid]:
-        data[gid]["status_channel_id"] = None
-    if "status_message_id" not in data[gid]:
-        data[gid]["status_message_id"] = None
-    if "mobs" not in data[gid]:
-        data[gid]["mobs"] = {}
-
-    save_data(data)
-    return data[gid]
+    gdata = data[gid]
+    gdata.setdefault("status_channel_id", None)
+    gdata.setdefault("status_message_id", None)
+    gdata.setdefault("mobs", {})
+    return gdata
 
 def update_guild_data(guild_id, gdata):
-    """Write back updated guild block."""
-    data = load_data()
-    data[str(guild_id)] = gdata
-    save_data(data)
+    """Mark a guild block changed (flushed by flush_data) and drop its indexes."""
+    forget_mob_index(gdata)
+    gid = str(guild_id)
+    load_data()[gid] = gdata
+    bot.dirty_guilds.add(gid)
 
 def normalize_mob_name(name: str) -> str:
     """Canonical key format."""
     return name.strip().lower()
 
-def format_timedelta(delta: timedelta) -> str:
-    """Format as Xm or Xh Ym."""
-    total = int(delta.total_seconds())
+def format_timedelta_sec(seconds: float) -> str:
+    """Format a duration in seconds as Xm, Xh or Xh Ym."""
+    total = int(seconds)
     if total < 0:
         total = -total
     hours, rest = divmod(total, 3600)
-    minutes, _ = divmod(rest, 60)
+    minutes = rest // 60
 
-    parts = []
-    if hours:
-        parts.append(f"{hours}h")
-    if minutes or not parts:
-        parts.append(f"{minutes}m")
-    return " ".join(parts)
+    if not hours:
+        return f"{minutes}m"
+    return f"{hours}h {minutes}m" if minutes else f"{hours}h"
 
 # ------------------------------------------------------------
 # Time & Date Parsing
 # ------------------------------------------------------------
 
-def looks_like_time(tok: str) -> bool:
-    """Check if token is HMM or HHMM."""
-    return tok.isdigit() and len(tok) in (3, 4)
+# "<name> [date] [HHMM]" in one pass. The date alternatives mirror the
+# formats parse_date_str accepts; the name is whatever precedes them.
+TOD_ARGS_RE = re.compile(
+    r"^(?P<name>.*?)"
+    r"(?:(?:^|\s+)(?P<date>\d{4}-\d{1,2}-\d{1,2}|\d{4}/\d{1,2}/\d{1,2}"
+    r"|\d{1,2}/\d{1,2}/(?:\d{4}|\d{2})))?"
+    r"(?:(?:^|\s+)(?P<time>\d{3,4}))?$",
+    re.ASCII | re.DOTALL,
+)
+
+# "<name> [HHMM]" for !spawn, which takes no date.
+SPAWN_ARGS_RE = re.compile(
+    r"^(?P<name>.*?)(?:(?:^|\s+)(?P<time>\d{3,4}))?$",
+    re.ASCII | re.DOTALL,
+)
+
+# YYYY-MM-DD / YYYY/MM/DD and MM/DD/YYYY / MM/DD/YY
+DATE_YMD_RE = re.compile(r"(\d{4})([-/])(\d{1,2})\2(\d{1,2})", re.ASCII)
+DATE_MDY_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})", re.ASCII)
 
 def parse_date_str(date_str: str):
     """Parse several common date formats."""
-    formats = ["%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%m/%d/%y"]
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except ValueError:
-            pass
+    try:
+        m = DATE_YMD_RE.fullmatch(date_str)
+        if m:
+            return date(int(m[1]), int(m[3]), int(m[4]))
+
+        m = DATE_MDY_RE.fullmatch(date_str)
+        if m:
+            year = int(m[3])
+            if len(m[3]) == 2:
+                year += 2000 if year < 69 else 1900  # same pivot as %y
+            return date(year, int(m[1]), int(m[2]))
+    except ValueError:
+        pass
     raise ValueError("Date must be YYYY-MM-DD or MM/DD/YYYY")
 
-def parse_time_str(time_str: str, for_date=None) -> datetime:
+def parse_time_str(time_str: str, for_date=None, now=None) -> datetime:
     """
     Interpret HHMM as either an explicit date's time or the most recent such time.
+    Pass the caller's `now` to avoid reading the clock twice per command.
     """
     s = time_str.strip()
-    if not s.isdigit() or len(s) not in (3, 4):
+    if len(s) not in (3, 4) or not (s.isascii() and s.isdigit()):
         raise ValueError("Time must be HMM or HHMM")
 
-    if len(s) == 3:
-        hour = int(s[0])
-        minute = int(s[1:])
-    else:
-        hour = int(s[:2])
-        minute = int(s[2:])
+    # One int() + divmod covers both widths: 930 -> (9, 30), 2145 -> (21, 45)
+    hour, minute = divmod(int(s), 100)
 
     if not (0 <= hour <= 23 and 0 <= minute <= 59):
         raise ValueError("Invalid numeric time")
@@ -141,17 +283,47 @@ def parse_time_str(time_str: str, for_date=None) -> datetime:
                         hour, minute, tzinfo=TIMEZONE)
 
     # No explicit date → fallback to latest matching time (today or yesterday)
-    now = now_local()
-    dt = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-    if dt > now:
-        dt -= timedelta(days=1)
-    return dt
+    if now is None:
+        now = now_local()
+    day = now.date()
+    if (hour, minute) > (now.hour, now.minute):
+        day -= timedelta(days=1)
+    return datetime.combine(day, dtime(hour, minute), TIMEZONE)
 
 # ------------------------------------------------------------
 # Fuzzy Matching (Option A)
 # ------------------------------------------------------------
 
-def fuzzy_find_mob(name: str, mobs: dict):
+def mob_keys(gdata: dict) -> list:
+    """
+    Guild's mob keys as a list for fuzzy matching, cached on the guild
+    block (in-memory only); update_guild_data drops it.
+    """
+    keys = gdata.get("_mob_keys")
+    if keys is None:
+        keys = gdata["_mob_keys"] = list(gdata["mobs"])
+    return keys
+
+def tracked_views(gdata: dict) -> list:
+    """
+    MobViews of the mobs with tracking on, in board order, cached on the
+    guild block (in-memory only) so a status tick is a plain list scan.
+    """
+    views = gdata.get("_tracked")
+    if views is None:
+        views = gdata["_tracked"] = [
+            mob.get("_view") or refresh_mob_view(key, mob)
+            for key, mob in gdata.get("mobs", {}).items()
+            if mob.get("tracking", False)
+        ]
+    return views
+
+def forget_mob_index(gdata: dict):
+    """Drop the guild's cached key list and tracked views after a write."""
+    gdata.pop("_mob_keys", None)
+    gdata.pop("_tracked", None)
+
+def fuzzy_find_mob(name: str, mobs: dict, keys: list = None):
     """
     Option A:
       - Exact match → return key
@@ -164,8 +336,16 @@ def fuzzy_find_mob(name: str, mobs: dict):
     if name in mobs:
         return name
 
-    keys = list(mobs.keys())
-    close = get_close_matches(name, keys, n=3, cutoff=0.6)
+    if keys is None:
+        keys = list(mobs.keys())
+    # Plain Indel ratio: close to difflib's SequenceMatcher.ratio but not
+    # identical (no substring scoring like WRatio). Keys are already
+    # normalized, so skip RapidFuzz's own preprocessing.
+    close = [
+        match for match, _score, _idx in
+        process.extract(name, keys, scorer=fuzz.ratio, processor=None,
+                        score_cutoff=60, limit=3)
+    ]
 
     if len(close) == 1:
         return close[0]
@@ -179,37 +359,110 @@ def fuzzy_find_mob(name: str, mobs: dict):
 # Auto-Learning Spawn Window
 # ------------------------------------------------------------
 
+def tod_history(mob_data: dict) -> deque:
+    """
+    Return tod_history as a sorted deque of epoch seconds capped at
+    TOD_HISTORY_MAX. Stored lists become the deque on first use; older
+    data holding ISO strings is converted to ints here, once.
+    """
+    history = mob_data.get("tod_history")
+    if not isinstance(history, deque):
+        history = deque(
+            sorted(
+                int(parse_iso(t).timestamp()) if isinstance(t, str) else t
+                for t in history or ()
+            ),
+            maxlen=TOD_HISTORY_MAX,
+        )
+        mob_data["tod_history"] = history
+        mob_data.pop("_intervals", None)
+    return history
+
+def tod_intervals(mob_data: dict) -> list:
+    """
+    Sorted respawn intervals (hours) between consecutive TODs, cached as
+    _intervals and kept up to date by record_tod.
+    """
+    intervals = mob_data.get("_intervals")
+    if intervals is None:
+        history = tod_history(mob_data)
+        intervals = sorted(
+            (b - a) / 3600.0
+            for a, b in zip(history, islice(history, 1, None))
+            if b - a > 900
+        )
+        mob_data["_intervals"] = intervals
+    return intervals
+
+def forget_tod_caches(mob_data: dict):
+    """Drop the cached intervals after tod_history is edited directly."""
+    mob_data.pop("_intervals", None)
+
+def add_interval(intervals: list, a: float, b: float):
+    """Insert the a→b gap (hours) into a sorted interval list."""
+    if b - a > 900:  # prevent tiny intervals (< 15 min)
+        bisect.insort(intervals, (b - a) / 3600.0)
+
+def remove_interval(intervals: list, a: float, b: float):
+    """Remove the a→b gap previously added by add_interval."""
+    if b - a > 900:
+        del intervals[bisect.bisect_left(intervals, (b - a) / 3600.0)]
+
+def record_tod(mob_data: dict, epoch: int):
+    """
+    Add a TOD (epoch seconds) to tod_history and the interval list. Only
+    the intervals next to the inserted/evicted TODs are touched.
+    """
+    history = tod_history(mob_data)
+    intervals = tod_intervals(mob_data)
+
+    # Usual case: newest TOD; append evicts the oldest entry in O(1)
+    if not history or epoch >= history[-1]:
+        if len(history) == TOD_HISTORY_MAX:
+            remove_interval(intervals, history[0], history[1])
+        if history:
+            add_interval(intervals, history[-1], epoch)
+        history.append(epoch)
+        return
+
+    # Backfilled TOD: insert in order, dropping the oldest if full
+    if len(history) == TOD_HISTORY_MAX:
+        if epoch < history[0]:
+            return  # older than everything we keep
+        remove_interval(intervals, history[0], history[1])
+        history.popleft()
+
+    i = bisect.bisect_right(history, epoch)
+    if i > 0:
+        add_interval(intervals, history[i - 1], epoch)
+        remove_interval(intervals, history[i - 1], history[i])
+    add_interval(intervals, epoch, history[i])
+    history.insert(i, epoch)
+
 def update_window_from_tod_history(mob_data: dict):
     """
-    Given list of TOD strings, compute:
+    Given the TOD history, compute:
     - min_respawn_hours
     - max_respawn_hours
     - learned_confidence
     """
-    history = mob_data.get("tod_history", [])
+    history = tod_history(mob_data)
     if len(history) < 2:
         mob_data["learned_confidence"] = "LOW"
         return None, None, "LOW"
 
-    times = sorted(datetime.fromisoformat(t) for t in history)
-    intervals = []
-
-    for a, b in zip(times, times[1:]):
-        hours = (b - a).total_seconds() / 3600.0
-        if hours > 0.25:  # prevent tiny intervals
-            intervals.append(hours)
+    # Maintained incrementally by record_tod, already sorted
+    intervals = tod_intervals(mob_data)
 
     if not intervals:
         mob_data["learned_confidence"] = "LOW"
         return None, None, "LOW"
 
-    intervals.sort()
-
     # Trim outliers if enough data
     trimmed = intervals[1:-1] if len(intervals) >= 4 else intervals
 
-    min_h = min(trimmed) * 0.95
-    max_h = max(trimmed) * 1.05
+    min_h = trimmed[0] * 0.95
+    max_h = trimmed[-1] * 1.05
 
     # Confidence
     n = len(intervals)
@@ -230,46 +483,121 @@ def update_window_from_tod_history(mob_data: dict):
 # Status Line Builder
 # ------------------------------------------------------------
 
-def mob_status_line(mob_key: str, mob_data: dict, now: datetime) -> str:
+class MobView:
+    """Flat snapshot of the fields the status line needs (in-memory only)."""
+    __slots__ = ("name", "tracking", "has_window", "earliest", "latest",
+                 "confidence", "parts", "line_key", "line")
+
+    def __init__(self, name: str, tracking: bool, has_window: bool,
+                 earliest: Optional[float], latest: Optional[float],
+                 confidence: str, parts: Optional[tuple] = None):
+        self.name = name
+        self.tracking = tracking
+        self.has_window = has_window
+        self.earliest = earliest  # epoch seconds
+        self.latest = latest
+        self.confidence = confidence
+        # (prefix, suffix) around the duration for CLOSED / OPEN / OVERDUE
+        self.parts = parts
+        # (state, whole minutes) -> rendered line, reused until the text changes
+        self.line_key = None
+        self.line = ""
+
+# MobView.parts / line_key state indexes
+CLOSED, OPEN, OVERDUE = 0, 1, 2
+
+def status_line_parts(name: str, conf: str) -> tuple:
+    """Fixed text around the duration for each window state."""
+    return (
+        (f"⏳ {name} — window CLOSED, opens in **", f"** (confidence: {conf})"),
+        (f"✅ {name} — **WINDOW OPEN**, ~", f" left (confidence: {conf})"),
+        (f"🔥 {name} — window OVERDUE by **", f"** (confidence: {conf})"),
+    )
+
+def window_base_epoch(mob_data: dict):
     """
-    Generate text line for !status and auto-updater.
+    Epoch of last_death (or else last_spawn), parsed once per distinct
+    value and cached as mob["_base_epoch"] = (iso, epoch).
+    """
+    base = mob_data.get("last_death") or mob_data.get("last_spawn")
+    if not base:
+        return None
+    cached = mob_data.get("_base_epoch")
+    if cached and cached[0] == base:
+        return cached[1]
+    epoch = parse_iso(base).timestamp()
+    mob_data["_base_epoch"] = (base, epoch)
+    return epoch
+
+def refresh_mob_view(mob_key: str, mob_data: dict) -> MobView:
     """
+    Rebuild the cached MobView (mob["_view"]) so the status loop reads
+    slots instead of reparsing timestamps and repeating dict lookups every
+    tick. Call whenever a mob's name, tracking flag, last_death,
+    last_spawn or respawn hours change.
+    """
+    min_h = mob_data.get("min_respawn_hours")
+    max_h = mob_data.get("max_respawn_hours")
+    has_window = min_h is not None and max_h is not None
+
+    earliest = latest = None
+    base_epoch = window_base_epoch(mob_data) if has_window else None
+    if base_epoch is not None:
+        earliest = base_epoch + min_h * 3600
+        latest = base_epoch + max_h * 3600
+
     name = mob_data.get("display_name", mob_key)
+    conf = mob_data.get("learned_confidence", "LOW")
+    view = MobView(
+        name=name,
+        tracking=mob_data.get("tracking", False),
+        has_window=has_window,
+        earliest=earliest,
+        latest=latest,
+        confidence=conf,
+        parts=status_line_parts(name, conf) if earliest is not None else None,
+    )
+    mob_data["_view"] = view
+    return view
 
-    if not mob_data.get("tracking", False):
+def mob_status_line(view: MobView, now_epoch: float) -> str:
+    """
+    Generate text line for !status and auto-updater.
+    """
+    name = view.name
+
+    if not view.tracking:
         return f"❌ {name} — tracking OFF"
 
-    min_h = mob_data.get("min_respawn_hours")
-    max_h = mob_data.get("max_respawn_hours")
-    last_death = mob_data.get("last_death")
-    last_spawn = mob_data.get("last_spawn")
-    conf = mob_data.get("learned_confidence", "LOW")
+    conf = view.confidence
 
-    if min_h is None or max_h is None:
+    if not view.has_window:
         return f"⚠️ {name} — no spawn window (`!setwindow {name} min max`)"
 
-    base_time = None
-    if last_death:
-        base_time = datetime.fromisoformat(last_death)
-    elif last_spawn:
-        base_time = datetime.fromisoformat(last_spawn)
+    earliest = view.earliest
+    latest = view.latest
 
-    if not base_time:
+    if earliest is None:
         return f"ℹ️ {name} — no TOD or spawn recorded yet. (confidence: {conf})"
 
-    earliest = base_time + timedelta(hours=min_h)
-    latest = base_time + timedelta(hours=max_h)
-
-    if now < earliest:
-        return (f"⏳ {name} — window CLOSED, opens in "
-                f"**{format_timedelta(earliest - now)}** (confidence: {conf})")
+    # The rendered text only depends on the state and the whole minutes
+    # shown, so reuse the previous line until one of those changes.
+    if now_epoch < earliest:
+        state, secs = CLOSED, earliest - now_epoch
+    elif now_epoch <= latest:
+        state, secs = OPEN, latest - now_epoch
+    else:
+        state, secs = OVERDUE, now_epoch - latest
 
-    if earliest <= now <= latest:
-        return (f"✅ {name} — **WINDOW OPEN**, ~"
-                f"{format_timedelta(latest - now)} left (confidence: {conf})")
+    line_key = (state, int(secs) // 60)
+    if view.line_key == line_key:
+        return view.line
 
-    return (f"🔥 {name} — window OVERDUE by "
-            f"**{format_timedelta(now - latest)}** (confidence: {conf})")
+    prefix, suffix = view.parts[state]
+    line = f"{prefix}{format_timedelta_sec(secs)}{suffix}"
+    view.line_key = line_key
+    view.line = line
+    return line
 
 # ------------------------------------------------------------
 # Bot Events / Background Loop
@@ -278,6 +606,13 @@ def mob_status_line(mob_key: str, mob_data: dict, now: datetime) -> str:
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user} (ID: {bot.user.id})")
+    data = load_data()
+    bot.status_guilds = {
+        int(gid) for gid, gdata in data.items()
+        if gdata.get("status_channel_id")
+    }
+    if not flush_data.is_running():
+        flush_data.start()
     if not update_status_messages.is_running():
         update_status_messages.start()
 
@@ -290,55 +625,134 @@ async def on_command_error(ctx, error):
         pass
     print(f"[ERROR] {error}")
 
-@tasks.loop(seconds=60)
-async def update_status_messages():
-    """Auto-refresh status board."""
-    now = now_local()
-    all_data = load_data()
+@tasks.loop(seconds=5)
+async def flush_data():
+    """Persist the guilds that changed since the last flush."""
+    if not bot.dirty_guilds:
+        return
+    guild_ids, bot.dirty_guilds = bot.dirty_guilds, set()
 
-    for guild in bot.guilds:
-        gid = str(guild.id)
-        gdata = all_data.get(gid)
-        if not gdata:
-            continue
+    # Encode here, since commands mutate the dicts on this thread; only
+    # the blocking SQLite write is moved off the event loop.
+    try:
+        rows = encode_guilds(bot.data_cache, guild_ids)
+        await asyncio.to_thread(write_guild_rows, rows)
+    except Exception as e:
+        # Retry on the next tick; raising here would stop the loop for good
+        bot.dirty_guilds |= guild_ids
+        print(f"[ERROR] saving data for guilds {sorted(guild_ids)}: {e}")
+
+@flush_data.after_loop
+async def flush_data_on_stop():
+    """Don't lose pending changes on shutdown."""
+    if bot.dirty_guilds:
+        guild_ids, bot.dirty_guilds = bot.dirty_guilds, set()
+        write_guild_rows(encode_guilds(bot.data_cache, guild_ids))
+
+async def refresh_guild_status(guild_id: int, now_epoch: float = None):
+    """Render one guild's status board and edit/send it if it changed."""
+    if now_epoch is None:
+        now_epoch = now_local().timestamp()
+
+    guild = bot.get_guild(guild_id)
+    gdata = load_data().get(str(guild_id))
+    if not guild or not gdata:
+        return
 
+    # Serialize refreshes per guild so a tick and a command-triggered
+    # refresh can't both send a new board message.
+    lock = bot.status_locks.setdefault(guild_id, asyncio.Lock())
+    async with lock:
         chan_id = gdata.get("status_channel_id")
         msg_id = gdata.get("status_message_id")
         mobs = gdata.get("mobs", {})
 
         if not chan_id:
-            continue
+            return
 
         channel = guild.get_channel(chan_id)
         if not channel:
-            continue
+            return
 
         if not mobs:
             content = "No mobs tracked. Use `!track MobName`."
         else:
             lines = [
-                mob_status_line(key, mob, now)
-                for key, mob in mobs.items()
-                if mob.get("tracking", False)
+                mob_status_line(view, now_epoch)
+                for view in tracked_views(gdata)
             ]
-            content = "__**Contested Mob Spawn Windows**__\n" + "\n".join(lines) if lines else "No mobs with tracking ON."
+            content = (
+                "\n".join(("__**Contested Mob Spawn Windows**__", *lines))
+                if lines else "No mobs with tracking ON."
+            )
+
+        # Skip the REST calls entirely when the board hasn't changed, and
+        # reuse the message handle from last time.
+        msg = None
+        cached = bot.status_cache.get(guild_id)
+        if cached and cached[1].id == msg_id:
+            if cached[0] == content:
+                return
+            msg = cached[1]
 
         try:
-            if msg_id:
-                msg = await channel.fetch_message(msg_id)
+            if msg is None and msg_id:
+                # No GET needed just to edit; NotFound below covers deletion
+                msg = channel.get_partial_message(msg_id)
+
+            if msg is not None:
                 await msg.edit(content=content)
             else:
                 msg = await channel.send(content)
                 gdata["status_message_id"] = msg.id
-                update_guild_data(guild.id, gdata)
+                update_guild_data(guild_id, gdata)
 
         except discord.NotFound:
             msg = await channel.send(content)
             gdata["status_message_id"] = msg.id
-            update_guild_data(guild.id, gdata)
+            update_guild_data(guild_id, gdata)
 
         except discord.Forbidden:
-            continue
+            return
+
+        bot.status_cache[guild_id] = (content, msg)
+
+def schedule_status_refresh(guild_id: int):
+    """Refresh a guild's board right after a command instead of next tick."""
+    if guild_id not in bot.status_guilds:
+        return
+    task = asyncio.create_task(refresh_guild_status(guild_id))
+    bot.status_tasks.add(task)  # keep a reference until it finishes
+    task.add_done_callback(bot.status_tasks.discard)
+
+    # Nothing awaits this task, so log failures here like the tick loop does
+    def report_error(task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[ERROR] status update for guild {guild_id}: {task.exception()}")
+
+    task.add_done_callback(report_error)
+
+@tasks.loop(seconds=60)
+async def update_status_messages():
+    """Auto-refresh status boards, once per wall-clock minute."""
+    now_epoch = now_local().timestamp()
+    guild_ids = tuple(bot.status_guilds)
+
+    # Guilds are independent, so run their REST calls concurrently; one
+    # guild's failure is logged without stopping the others (or the loop).
+    results = await asyncio.gather(
+        *(refresh_guild_status(guild_id, now_epoch) for guild_id in guild_ids),
+        return_exceptions=True,
+    )
+    for guild_id, result in zip(guild_ids, results):
+        if isinstance(result, Exception):
+            print(f"[ERROR] status update for guild {guild_id}: {result}")
+
+@update_status_messages.before_loop
+async def align_status_updates():
+    """Start ticking on a minute boundary so countdowns match the clock."""
+    await asyncio.sleep(60 - time.time() % 60)
+
 # ------------------------------------------------------------
 # TOD Command (explicit date + fuzzy)
 # ------------------------------------------------------------
@@ -358,39 +772,32 @@ async def update_status_messages():
 )
 async def tod(ctx, *, mob_and_time: str):
     now = now_local()
-    parts = mob_and_time.split()
-
-    time_token = None
-    date_obj = None
-
-    # Identify time token:
-    if parts and looks_like_time(parts[-1]):
-        time_token = parts[-1]
-        parts = parts[:-1]
+    m = TOD_ARGS_RE.match(mob_and_time.strip())
+    mob_name = " ".join(m["name"].split())  # collapse runs of whitespace
+    date_str = m["date"]
+    time_token = m["time"]
 
-    # Identify date:
-    if parts:
-        possible_date = parts[-1]
-        try:
-            date_obj = parse_date_str(possible_date)
-            parts = parts[:-1]
-        except ValueError:
-            date_obj = None
-
-    mob_name = " ".join(parts).strip()
     if not mob_name:
         await ctx.send("Error: You must specify a mob name.")
         return
 
     # If date provided but no time:
-    if date_obj and not time_token:
+    if date_str and not time_token:
         await ctx.send("You must provide both date AND time. Example: `!tod Pumpkinhead 2025-12-05 0200`")
         return
 
+    date_obj = None
+    if date_str:
+        try:
+            date_obj = parse_date_str(date_str)
+        except ValueError as e:
+            await ctx.send(f"Invalid date: {e}")
+            return
+
     # Determine TOD timestamp:
     if time_token:
         try:
-            tod_time = parse_time_str(time_token, for_date=date_obj)
+            tod_time = parse_time_str(time_token, for_date=date_obj, now=now)
         except ValueError as e:
             await ctx.send(f"Invalid time: {e}")
             return
@@ -403,7 +810,7 @@ async def tod(ctx, *, mob_and_time: str):
 
     # Fuzzy match:
     raw_key = normalize_mob_name(mob_name)
-    fuzzy = fuzzy_find_mob(raw_key, mobs)
+    fuzzy = fuzzy_find_mob(raw_key, mobs, mob_keys(gdata))
 
     if isinstance(fuzzy, list):
         await ctx.send("Mob name ambiguous. Did you mean:\n" +
@@ -427,19 +834,22 @@ async def tod(ctx, *, mob_and_time: str):
 
     mob = mobs[key]
     mob["display_name"] = mob_name
-    mob["last_death"] = tod_time.isoformat()
+    iso = tod_time.isoformat()
+    epoch = tod_time.timestamp()
+    mob["last_death"] = iso
+    mob["_base_epoch"] = (iso, epoch)
 
     # TOD history update:
-    history = mob.get("tod_history", [])
-    history.append(tod_time.isoformat())
-    mob["tod_history"] = sorted(history)[-10:]  # keep last 10
+    record_tod(mob, int(epoch))
 
     # Auto-learn:
     min_h, max_h, conf = update_window_from_tod_history(mob)
+    refresh_mob_view(key, mob)
 
     update_guild_data(ctx.guild.id, gdata)
+    schedule_status_refresh(ctx.guild.id)
 
-    when = tod_time.strftime("%Y-%m-%d %H:%M")
+    when = f"{iso[:10]} {iso[11:16]}"  # YYYY-MM-DD HH:MM
     msg = f"☠️ Recorded TOD for **{mob_name}** at `{when}`."
     if min_h is not None:
         msg += f"\n🧠 Auto-learned window: **{min_h}–{max_h} hours** (confidence: {conf})."
@@ -453,23 +863,17 @@ async def tod(ctx, *, mob_and_time: str):
 @bot.command(help="Record a mob's spawn time. Usage: !spawn MobName [HHMM]")
 async def spawn(ctx, *, mob_and_time: str):
     now = now_local()
-    parts = mob_and_time.split()
+    m = SPAWN_ARGS_RE.match(mob_and_time.strip())
+    mob_name = " ".join(m["name"].split())  # collapse runs of whitespace
+    time_token = m["time"]
 
-    time_token = None
-    if parts and looks_like_time(parts[-1]):
-        time_token = parts[-1]
-        mob_name = " ".join(parts[:-1])
-    else:
-        mob_name = mob_and_time
-
-    mob_name = mob_name.strip()
     if not mob_name:
         await ctx.send("Usage: `!spawn MobName [HHMM]`")
         return
 
     if time_token:
         try:
-            spawn_time = parse_time_str(time_token)
+            spawn_time = parse_time_str(time_token, now=now)
         except ValueError as e:
             await ctx.send(f"Invalid time: {e}")
             return
@@ -482,7 +886,7 @@ async def spawn(ctx, *, mob_and_time: str):
 
     # Fuzzy:
     raw_key = normalize_mob_name(mob_name)
-    fuzzy = fuzzy_find_mob(raw_key, mobs)
+    fuzzy = fuzzy_find_mob(raw_key, mobs, mob_keys(gdata))
     if isinstance(fuzzy, list):
         await ctx.send("Ambiguous mob name. Did you mean:\n" +
                        "\n".join(f" • {mobs[k]['display_name']}" for k in fuzzy))
@@ -504,11 +908,16 @@ async def spawn(ctx, *, mob_and_time: str):
 
     mob = mobs[key]
     mob["display_name"] = mob_name
-    mob["last_spawn"] = spawn_time.isoformat()
+    iso = spawn_time.isoformat()
+    mob["last_spawn"] = iso
+    if not mob.get("last_death"):
+        mob["_base_epoch"] = (iso, spawn_time.timestamp())
+    refresh_mob_view(key, mob)
 
     update_guild_data(ctx.guild.id, gdata)
+    schedule_status_refresh(ctx.guild.id)
 
-    when = spawn_time.strftime("%Y-%m-%d %H:%M")
+    when = f"{iso[:10]} {iso[11:16]}"  # YYYY-MM-DD HH:MM
     await ctx.send(f"🌱 Recorded spawn for **{mob_name}** at `{when}`.")
 
 
@@ -522,7 +931,7 @@ async def track(ctx, *, mob_name: str):
     mobs = gdata["mobs"]
 
     raw_key = normalize_mob_name(mob_name)
-    fuzzy = fuzzy_find_mob(raw_key, mobs)
+    fuzzy = fuzzy_find_mob(raw_key, mobs, mob_keys(gdata))
 
     if isinstance(fuzzy, list):
         await ctx.send("Ambiguous mob name. Did you mean:\n" +
@@ -546,7 +955,9 @@ async def track(ctx, *, mob_name: str):
         mobs[key]["display_name"] = mob_name
         mobs[key]["tracking"] = True
 
+    refresh_mob_view(key, mobs[key])
     update_guild_data(ctx.guild.id, gdata)
+    schedule_status_refresh(ctx.guild.id)
     await ctx.send(f"🟢 Tracking **{mob_name}** enabled.")
 
 @bot.command(help="Stop tracking a mob (keeps its data). Usage: !untrack MobName")
@@ -555,7 +966,7 @@ async def untrack(ctx, *, mob_name: str):
     mobs = gdata["mobs"]
 
     raw_key = normalize_mob_name(mob_name)
-    fuzzy = fuzzy_find_mob(raw_key, mobs)
+    fuzzy = fuzzy_find_mob(raw_key, mobs, mob_keys(gdata))
     if isinstance(fuzzy, list):
         await ctx.send("Ambiguous mob name. Did you mean:\n" +
                        "\n".join(f" • {mobs[k]['display_name']}" for k in fuzzy))
@@ -567,7 +978,9 @@ async def untrack(ctx, *, mob_name: str):
         return
 
     mobs[key]["tracking"] = False
+    refresh_mob_view(key, mobs[key])
     update_guild_data(ctx.guild.id, gdata)
+    schedule_status_refresh(ctx.guild.id)
     await ctx.send(f"🔴 Tracking **{mobs[key]['display_name']}** disabled.")
 
 
@@ -581,7 +994,7 @@ async def deletemob(ctx, *, mob_name: str):
     mobs = gdata["mobs"]
 
     raw_key = normalize_mob_name(mob_name)
-    fuzzy = fuzzy_find_mob(raw_key, mobs)
+    fuzzy = fuzzy_find_mob(raw_key, mobs, mob_keys(gdata))
     if isinstance(fuzzy, list):
         await ctx.send("Ambiguous mob name:\n" +
                        "\n".join(f" • {mobs[k]['display_name']}" for k in fuzzy))
@@ -594,6 +1007,7 @@ async def deletemob(ctx, *, mob_name: str):
 
     del mobs[key]
     update_guild_data(ctx.guild.id, gdata)
+    schedule_status_refresh(ctx.guild.id)
     await ctx.send(f"🗑️ Deleted mob **{mob_name}**.")
 
 @bot.command(help="Rename a mob. Usage: !renamemob Old Name | New Name")
@@ -609,7 +1023,7 @@ async def renamemob(ctx, *, args: str):
 
     # Fuzzy match old name
     raw_key = normalize_mob_name(old_name)
-    fuzzy = fuzzy_find_mob(raw_key, mobs)
+    fuzzy = fuzzy_find_mob(raw_key, mobs, mob_keys(gdata))
     if isinstance(fuzzy, list):
         await ctx.send("Ambiguous original name:\n" +
                        "\n".join(f" • {mobs[k]['display_name']}" for k in fuzzy))
@@ -628,8 +1042,10 @@ async def renamemob(ctx, *, args: str):
     mob = mobs.pop(old_key)
     mob["display_name"] = new_name
     mobs[new_key] = mob
+    refresh_mob_view(new_key, mob)
 
     update_guild_data(ctx.guild.id, gdata)
+    schedule_status_refresh(ctx.guild.id)
     await ctx.send(f"✏️ Renamed **{old_name}** → **{new_name}**.")
 
 @bot.command(help="Undo the last TOD entry. Usage: !undo MobName")
@@ -638,7 +1054,7 @@ async def undo(ctx, *, mob_name: str):
     mobs = gdata["mobs"]
 
     raw_key = normalize_mob_name(mob_name)
-    fuzzy = fuzzy_find_mob(raw_key, mobs)
+    fuzzy = fuzzy_find_mob(raw_key, mobs, mob_keys(gdata))
     if isinstance(fuzzy, list):
         await ctx.send("Ambiguous name:\n" +
                        "\n".join(f" • {mobs[k]['display_name']}" for k in fuzzy))
@@ -651,14 +1067,14 @@ async def undo(ctx, *, mob_name: str):
         return
 
     mob = mobs[key]
-    history = mob.get("tod_history", [])
+    history = tod_history(mob)
 
     if not history:
         await ctx.send(f"No TOD history for **{mob['display_name']}**.")
         return
 
-    removed = history.pop()
-    mob["tod_history"] = history
+    removed = datetime.fromtimestamp(history.pop(), TIMEZONE).strftime("%Y-%m-%d %H:%M")
+    forget_tod_caches(mob)  # re-derived on next use
 
     if len(history) >= 2:
         min_h, max_h, conf = update_window_from_tod_history(mob)
@@ -673,7 +1089,9 @@ async def undo(ctx, *, mob_name: str):
             f"Not enough TOD data to compute a window."
         )
 
+    refresh_mob_view(key, mob)
     update_guild_data(ctx.guild.id, gdata)
+    schedule_status_refresh(ctx.guild.id)
     await ctx.send(msg)
 
 
@@ -683,24 +1101,26 @@ async def undo(ctx, *, mob_name: str):
 
 @bot.command(help="Set spawn window manually. Usage: !setwindow MobName min max")
 async def setwindow(ctx, *, args: str):
-    parts = args.split()
+    # Split off just the two trailing numbers
+    parts = args.rsplit(None, 2)
     if len(parts) < 3:
         await ctx.send("Usage: `!setwindow MobName min max`")
         return
 
+    mob_name, min_str, max_str = parts
+    mob_name = " ".join(mob_name.split())  # collapse runs of whitespace
     try:
-        min_h = float(parts[-2])
-        max_h = float(parts[-1])
+        min_h = float(min_str)
+        max_h = float(max_str)
     except ValueError:
         await ctx.send("min and max must be numbers.")
         return
 
-    mob_name = " ".join(parts[:-2])
     gdata = get_guild_data(ctx.guild.id)
     mobs = gdata["mobs"]
 
     raw_key = normalize_mob_name(mob_name)
-    fuzzy = fuzzy_find_mob(raw_key, mobs)
+    fuzzy = fuzzy_find_mob(raw_key, mobs, mob_keys(gdata))
     if isinstance(fuzzy, list):
         await ctx.send("Ambiguous mob name:\n" +
                        "\n".join(f" • {mobs[k]['display_name']}" for k in fuzzy))
@@ -722,7 +1142,9 @@ async def setwindow(ctx, *, args: str):
         mobs[key]["min_respawn_hours"] = min_h
         mobs[key]["max_respawn_hours"] = max_h
 
+    refresh_mob_view(key, mobs[key])
     update_guild_data(ctx.guild.id, gdata)
+    schedule_status_refresh(ctx.guild.id)
     await ctx.send(f"⏱️ Window for **{mob_name}** set to **{min_h}-{max_h} hours**.")
 
 
@@ -741,6 +1163,8 @@ async def setstatuschannel(ctx, channel: discord.TextChannel = None):
     gdata["status_message_id"] = None
 
     update_guild_data(ctx.guild.id, gdata)
+    bot.status_guilds.add(ctx.guild.id)
+    schedule_status_refresh(ctx.guild.id)
 
     await ctx.send(f"📡 Status updates will now appear in {channel.mention}.")
 
@@ -751,7 +1175,7 @@ async def setstatuschannel(ctx, channel: discord.TextChannel = None):
 
 @bot.command(help="Show current spawn windows.")
 async def status(ctx):
-    now = now_local()
+    now_epoch = now_local().timestamp()
     gdata = get_guild_data(ctx.guild.id)
     mobs = gdata.get("mobs", {})
 
@@ -760,16 +1184,15 @@ async def status(ctx):
         return
 
     lines = [
-        mob_status_line(key, mob, now)
-        for key, mob in mobs.items()
-        if mob.get("tracking", False)
+        mob_status_line(view, now_epoch)
+        for view in tracked_views(gdata)
     ]
 
     if not lines:
         await ctx.send("No mobs have tracking enabled.")
         return
 
-    await ctx.send("__**Contested Mob Spawn Windows**__\n" + "\n".join(lines))
+    await ctx.send("\n".join(("__**Contested Mob Spawn Windows**__", *lines)))
 
 
 # ------------------------------------------------------------